@@ -1,16 +1,155 @@
-import os, time, math, random
-from fastapi import FastAPI, Query
+import os, time, json, asyncio, zlib
+import numpy as np
+from fastapi import FastAPI, Query, HTTPException
+from fastapi.responses import StreamingResponse
 
 SEED = int(os.getenv("SEED", "42"))
-random.seed(SEED)
+STREAM_PAIRS = os.getenv("STREAM_PAIRS", "BTCUSDT,ETHUSDT")
+HISTORY_MAX_SAMPLES = int(os.getenv("HISTORY_MAX_SAMPLES", "5000000"))
+HISTORY_MAX_CANDLES = int(os.getenv("HISTORY_MAX_CANDLES", "5000"))
+BATCH_MAX_PAIRS = int(os.getenv("BATCH_MAX_PAIRS", "500"))
+MAX_REGISTERED_PAIRS = int(os.getenv("MAX_REGISTERED_PAIRS", "10000"))
+
+INTERVALS = {"1s": 1, "1m": 60, "5m": 300, "15m": 900, "1h": 3600, "4h": 14400, "1d": 86400}
 
 api = FastAPI(title="Collector Crypto (Demo)", version="0.1.0")
 
+# pair -> (base price, per-tick volatility as a fraction of price)
+DEFAULT_PAIRS = {
+    "BTCUSDT": (60000.0, 0.0008),
+    "ETHUSDT": (3000.0, 0.0012),
+    "SOLUSDT": (150.0, 0.002),
+    "BNBUSDT": (550.0, 0.001),
+    "XRPUSDT": (0.6, 0.002),
+    "ADAUSDT": (0.45, 0.002),
+    "DOGEUSDT": (0.15, 0.003),
+}
+
+class PairGenerator:
+    """Deterministic price model for one pair, parameterised from its own seeded RNG"""
+
+    def __init__(self, pair: str, base: float = None, volatility: float = None):
+        self.pair = pair
+        self.key = zlib.crc32(pair.encode())
+        self.rng = np.random.default_rng([SEED, self.key])
+        # Unknown pairs get a plausible base price and volatility of their own
+        self.base = base if base is not None else float(10 ** self.rng.uniform(-1, 3))
+        self.volatility = volatility if volatility is not None else float(self.rng.uniform(0.001, 0.004))
+        self.amplitude = float(self.rng.uniform(0.01, 0.03))
+        self.period = float(self.rng.uniform(200, 900))
+        self.phase = float(self.rng.uniform(0, 2 * np.pi))
+        self.volume_scale = float(self.rng.uniform(100, 300))
+        self.decimals = 2 if self.base >= 10 else 6
+
+generators = {pair: PairGenerator(pair, base, vol) for pair, (base, vol) in DEFAULT_PAIRS.items()}
+
+def get_generator(pair: str) -> PairGenerator:
+    gen = generators.get(pair)
+    if gen is None:
+        gen = PairGenerator(pair)
+        # Generators are pure functions of the pair name, so skipping the registry is harmless
+        if len(generators) < MAX_REGISTERED_PAIRS:
+            generators[pair] = gen
+    return gen
+
+def uniform_noise(ts: np.ndarray, stream: np.ndarray) -> np.ndarray:
+    # Counter-based noise in [0, 1): the same (SEED, stream, ts) always gives the same value
+    with np.errstate(over="ignore"):
+        x = ts.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        x = x ^ ((np.uint64(SEED) << np.uint64(33)) + stream.astype(np.uint64))
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+def series(gens: list, ts: np.ndarray):
+    """Demo-only price generator (sine wave + noise): (pairs x ts) price and volume arrays"""
+    param = lambda name: np.array([getattr(g, name) for g in gens], dtype=np.float64)[:, None]
+    keys = np.array([g.key for g in gens], dtype=np.uint64)[:, None] << np.uint64(1)
+    base, scale = param("base"), 10.0 ** param("decimals")
+    t = ts.astype(np.float64)[None, :]
+    wave = np.sin(t / param("period") + param("phase"))
+    noise = uniform_noise(ts[None, :], keys) * 2 - 1
+    price = base * (1 + param("amplitude") * wave + param("volatility") * noise)
+    volume = np.abs(np.sin(t / 60.0 + param("phase"))) * param("volume_scale") + uniform_noise(ts[None, :], keys | np.uint64(1)) * 50
+    return np.round(price * scale) / scale, np.round(volume, 2)
+
+def make_ticks(pairs: list) -> list:
+    ts = int(time.time())
+    prices, volumes = series([get_generator(p) for p in pairs], np.array([ts], dtype=np.int64))
+    return [{"pair": pair, "price": float(prices[i, 0]), "volume": float(volumes[i, 0]), "ts": ts}
+            for i, pair in enumerate(pairs)]
+
+def make_tick(pair: str) -> dict:
+    return make_ticks([pair])[0]
+
+def parse_pairs(pairs: str) -> list:
+    return [p.strip() for p in pairs.split(",") if p.strip()]
+
+def ohlcv(ts: np.ndarray, price: np.ndarray, volume: np.ndarray, interval: int) -> dict:
+    """Aggregate per-second samples starting at ts[0] into `interval`-second candles"""
+    starts = np.arange(0, len(ts), interval)
+    ends = np.append(starts[1:], len(ts)) - 1
+    return {
+        "ts": ts[starts].tolist(),
+        "open": price[starts].tolist(),
+        "high": np.maximum.reduceat(price, starts).tolist(),
+        "low": np.minimum.reduceat(price, starts).tolist(),
+        "close": price[ends].tolist(),
+        "volume": np.round(np.add.reduceat(volume, starts), 2).tolist(),
+    }
+
 @api.get("/price")
 def price(pair: str = Query("BTCUSDT")):
-    # Demo-only price generator (sine wave + noise)
-    t = time.time()
-    base = 60000 + 1000 * math.sin(t / 300.0)
-    price = round(base + random.uniform(-50, 50), 2)
-    volume = round(abs(math.sin(t / 60.0)) * 200 + random.uniform(0, 50), 2)
-    return {"pair": pair, "price": price, "volume": volume, "ts": int(t)}
+    return make_tick(pair)
+
+@api.get("/prices")
+def batch_prices(pairs: str = Query(STREAM_PAIRS)):
+    """Current tick for every requested pair, computed in one vectorized call"""
+    pair_list = parse_pairs(pairs)
+    if len(pair_list) > BATCH_MAX_PAIRS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_PAIRS} pairs per request")
+    return {"prices": make_ticks(pair_list)}
+
+@api.get("/history")
+def history(pair: str = Query("BTCUSDT"), start: int = Query(..., ge=0),
+            end: int = Query(...), interval: str = Query("1m")):
+    """OHLCV candles over [start, end) unix seconds; ticks are reproducible per timestamp.
+    
+    start is snapped back to the previous interval boundary, so the first
+    candle may begin before the requested start.
+    """
+    step = INTERVALS.get(interval)
+    if step is None:
+        raise HTTPException(status_code=400, detail=f"interval must be one of {', '.join(INTERVALS)}")
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+
+    # Candles are aligned to interval boundaries
+    start -= start % step
+    if end - start > HISTORY_MAX_SAMPLES:
+        raise HTTPException(status_code=400, detail=f"Range too large (max {HISTORY_MAX_SAMPLES} seconds)")
+    if -(-(end - start) // step) > HISTORY_MAX_CANDLES:
+        raise HTTPException(status_code=400, detail=f"Too many candles (max {HISTORY_MAX_CANDLES}); use a larger interval")
+
+    ts = np.arange(start, end, dtype=np.int64)
+    prices, volumes = series([get_generator(pair)], ts)
+    candles = ohlcv(ts, prices[0], volumes[0], step)
+    return {"pair": pair, "interval": interval, "start": start, "end": end,
+            "count": len(candles["ts"]), "candles": candles}
+
+@api.get("/stream")
+async def stream(pairs: str = Query(STREAM_PAIRS), interval: float = Query(1.0, ge=0.1, le=60.0)):
+    """Server-sent events: one `tick` event per pair every `interval` seconds"""
+    pair_list = parse_pairs(pairs)
+
+    async def events():
+        while True:
+            for tick in make_ticks(pair_list):
+                yield f"event: tick\ndata: {json.dumps(tick)}\n\n"
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
@@ -1,6 +1,9 @@
 -- SquidPro Database Schema - Compatible with app.py
 -- This creates the tables that your app.py code expects
 
+-- Trigram matching for fuzzy package name search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 
 
 CREATE TABLE users (
@@ -53,25 +56,36 @@ CREATE TABLE data_packages (
     description TEXT,
     category VARCHAR(100),
     endpoint_url TEXT NOT NULL,
-    price_per_query DECIMAL(10,6) DEFAULT 0.005,
+    price_per_query_micros BIGINT DEFAULT 5000, -- micro-USD (1 USD = 1000000)
     sample_data JSONB,
     schema_definition JSONB,
     rate_limit INTEGER DEFAULT 1000, -- queries per hour
     status VARCHAR(20) DEFAULT 'active' CHECK (status IN ('active', 'inactive', 'pending_review')),
     tags TEXT[], -- array of tags for searching
     package_type VARCHAR(20) DEFAULT 'api',
+    timeout_ms INTEGER, -- upstream timeout override, NULL = server default
+    update_frequency VARCHAR(20) DEFAULT 'real-time', -- drives upstream response cache TTL
+    mirror_urls TEXT[], -- optional mirrors of endpoint_url used for hedged requests
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', COALESCE(name, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(description, '')), 'B')
+    ) STORED,
     created_at TIMESTAMP DEFAULT NOW(),
     updated_at TIMESTAMP DEFAULT NOW()
 );
 
+CREATE INDEX idx_data_packages_search ON data_packages USING GIN (search_vector);
+CREATE INDEX idx_data_packages_tags ON data_packages USING GIN (tags);
+CREATE INDEX idx_data_packages_name_trgm ON data_packages USING GIN (name gin_trgm_ops);
+
 -- Balance tracking
 CREATE TABLE balances (
     id SERIAL PRIMARY KEY,
     user_type VARCHAR(20) CHECK (user_type IN ('supplier', 'reviewer', 'squidpro')),
     user_id VARCHAR(255),
-    balance_usd DECIMAL(10,6) DEFAULT 0,
-    pending_payout_usd DECIMAL(10,6) DEFAULT 0,
-    payout_threshold_usd DECIMAL(10,2) DEFAULT 25.00,
+    balance_micros BIGINT DEFAULT 0, -- all amounts in micro-USD
+    pending_payout_micros BIGINT DEFAULT 0,
+    payout_threshold_micros BIGINT DEFAULT 25000000,
     UNIQUE(user_type, user_id)
 );
 
@@ -80,7 +94,7 @@ CREATE TABLE payout_history (
     id SERIAL PRIMARY KEY,
     stellar_tx_hash VARCHAR(64),
     recipient_address VARCHAR(56),
-    amount_usd DECIMAL(10,6),
+    amount_micros BIGINT,
     user_type VARCHAR(20),
     user_id VARCHAR(255),
     created_at TIMESTAMP DEFAULT NOW()
@@ -93,7 +107,7 @@ CREATE TABLE query_history (
     agent_id VARCHAR(255),
     query_params JSONB,
     response_size INTEGER,
-    cost DECIMAL(10,6),
+    cost_micros BIGINT,
     trace_id VARCHAR(255),
     created_at TIMESTAMP DEFAULT NOW()
 );
@@ -105,11 +119,12 @@ CREATE TABLE review_tasks (
     task_type VARCHAR(50) CHECK (task_type IN ('accuracy', 'freshness', 'schema', 'consensus', 'spot_audit')),
     status VARCHAR(20) DEFAULT 'open' CHECK (status IN ('open', 'in_progress', 'completed', 'expired')),
     required_reviews INTEGER DEFAULT 3,
-    reward_pool_usd DECIMAL(10,6) DEFAULT 0.05,
+    reward_pool_micros BIGINT DEFAULT 50000,
     reference_query JSONB,
     expires_at TIMESTAMP DEFAULT (NOW() + INTERVAL '24 hours'),
     created_at TIMESTAMP DEFAULT NOW(),
-    created_by VARCHAR(20) DEFAULT 'system'
+    created_by VARCHAR(20) DEFAULT 'system',
+    submission_count INTEGER NOT NULL DEFAULT 0
 );
 
 -- Individual review submissions
@@ -126,7 +141,7 @@ CREATE TABLE review_submissions (
     test_timestamp TIMESTAMP,
     submitted_at TIMESTAMP DEFAULT NOW(),
     is_consensus BOOLEAN DEFAULT FALSE,
-    payout_earned DECIMAL(10,6) DEFAULT 0
+    payout_earned_micros BIGINT DEFAULT 0
 );
 
 -- Package quality scores (aggregated from reviews)
@@ -148,9 +163,10 @@ CREATE TABLE reviewer_stats (
     id SERIAL PRIMARY KEY,
     reviewer_id INTEGER REFERENCES reviewers(id) UNIQUE,
     total_reviews INTEGER DEFAULT 0,
+    consensus_reviews INTEGER NOT NULL DEFAULT 0,
     consensus_rate DECIMAL(3,2) DEFAULT 0,
-    accuracy_score DECIMAL(3,2) DEFAULT 0,
-    total_earned DECIMAL(10,6) DEFAULT 0,
+    accuracy_score DECIMAL(4,2) DEFAULT 0,
+    total_earned_micros BIGINT DEFAULT 0,
     avg_review_time_minutes INTEGER DEFAULT 0,
     specializations TEXT[],
     reputation_level VARCHAR(20) DEFAULT 'novice',
@@ -189,6 +205,45 @@ CREATE TABLE pii_detection_log (
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Login sessions shared by all API workers; disposable, so no WAL
+CREATE UNLOGGED TABLE user_sessions (
+    token_hash CHAR(64) PRIMARY KEY,
+    data JSONB NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX idx_user_sessions_expires ON user_sessions(expires_at);
+
+-- Revoked token ids, kept until the token would have expired anyway
+CREATE TABLE revoked_tokens (
+    jti VARCHAR(64) PRIMARY KEY,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+-- Prepaid credit per minted token (jti). Workers lease slices of the credit,
+-- spend them in memory and reconcile spent_micros in batches.
+CREATE TABLE credit_accounts (
+    jti VARCHAR(64) PRIMARY KEY,
+    agent_id VARCHAR(255) NOT NULL,
+    credit_micros BIGINT NOT NULL,
+    leased_micros BIGINT NOT NULL DEFAULT 0,
+    spent_micros BIGINT NOT NULL DEFAULT 0,
+    expires_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- API-key principals (kept in one file shared with /admin/migrate)
+\ir sql/principals.sql
+
+-- Package counts per facet value (category, tag, price band, rating band),
+-- maintained in the same transaction as package creation and rating updates
+CREATE TABLE package_facets (
+    facet VARCHAR(20) NOT NULL,
+    value TEXT NOT NULL,
+    package_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (facet, value)
+);
+
 -- Insert demo suppliers and reviewers with Stellar addresses
 INSERT INTO suppliers (name, stellar_address, email, api_key) VALUES 
 ('demo_supplier', 'GDXDSB444OLNDYOJAVGU3JWQO4BEGQT2MCVTDHLOWORRQODJJXO3GBDU', 'demo@cryptodata.io', 'sup_demo_12345'),
@@ -199,31 +254,49 @@ INSERT INTO reviewers (name, stellar_address) VALUES
 ('quality_auditor_1', 'GDXDSB444OLNDYOJAVGU3JWQO4BEGQT2MCVTDHLOWORRQODJJXO3GBDU');
 
 -- Insert demo data packages
-INSERT INTO data_packages (supplier_id, name, description, category, endpoint_url, price_per_query, sample_data, tags) VALUES 
-(1, 'Crypto Price Feed', 'Real-time cryptocurrency prices with volume data', 'financial', 'http://collector-crypto:8200/price', 0.005, 
+INSERT INTO data_packages (supplier_id, name, description, category, endpoint_url, price_per_query_micros, sample_data, tags) VALUES 
+(1, 'Crypto Price Feed', 'Real-time cryptocurrency prices with volume data', 'financial', 'http://collector-crypto:8200/price', 5000, 
  '{"pair": "BTCUSDT", "price": 65000.50, "volume": 123.45, "ts": 1693123456}', 
  ARRAY['crypto', 'prices', 'real-time']),
  
-(1, 'Market Sentiment Analysis', 'AI-powered sentiment analysis of crypto markets', 'financial', 'http://collector-crypto:8200/sentiment', 0.015,
+(1, 'Market Sentiment Analysis', 'AI-powered sentiment analysis of crypto markets', 'financial', 'http://collector-crypto:8200/sentiment', 15000,
  '{"symbol": "BTC", "sentiment": "bullish", "confidence": 0.85, "factors": ["social_media", "news"]}',
  ARRAY['sentiment', 'ai', 'analysis']),
 
-(2, 'Weather Data Global', 'Current weather conditions for major cities worldwide', 'weather', 'http://weather-api:8300/current', 0.003,
+(2, 'Weather Data Global', 'Current weather conditions for major cities worldwide', 'weather', 'http://weather-api:8300/current', 3000,
  '{"city": "New York", "temp": 22.5, "humidity": 65, "conditions": "partly_cloudy"}',
  ARRAY['weather', 'global', 'current']);
 
 -- Insert default balances with lower thresholds for demo
-INSERT INTO balances (user_type, user_id, payout_threshold_usd) VALUES 
-('squidpro', 'treasury', 100.00),
-('supplier', '1', 0.02),
-('supplier', '2', 0.02),
-('reviewer', 'demo_reviewer_pool', 0.01);
+INSERT INTO balances (user_type, user_id, payout_threshold_micros) VALUES 
+('squidpro', 'treasury', 100000000),
+('supplier', '1', 20000),
+('supplier', '2', 20000),
+('reviewer', 'demo_reviewer_pool', 10000);
 
 -- Initialize quality scores for existing packages
 INSERT INTO package_quality_scores (package_id) 
 SELECT id FROM data_packages ON CONFLICT (package_id) DO NOTHING;
 
+-- Seed facet counts for the demo packages (none are reviewed yet)
+INSERT INTO package_facets (facet, value, package_count)
+SELECT 'category', category, COUNT(*) FROM data_packages WHERE category IS NOT NULL GROUP BY category
+UNION ALL
+SELECT 'tag', tag, COUNT(DISTINCT id) FROM data_packages, unnest(tags) AS tag GROUP BY tag
+UNION ALL
+SELECT 'price_band', CASE
+        WHEN price_per_query_micros < 1000 THEN '<$0.001'
+        WHEN price_per_query_micros < 10000 THEN '$0.001-$0.01'
+        WHEN price_per_query_micros < 100000 THEN '$0.01-$0.10'
+        ELSE '$0.10+'
+    END AS band, COUNT(*) FROM data_packages GROUP BY band
+UNION ALL
+SELECT 'rating_band', 'unrated', COUNT(*) FROM data_packages;
+
 -- Add index for performance
 CREATE INDEX idx_review_tasks_status ON review_tasks(status);
 CREATE INDEX idx_review_submissions_task ON review_submissions(task_id);
+CREATE UNIQUE INDEX idx_review_submissions_reviewer_task_unique ON review_submissions(reviewer_id, task_id);
+CREATE INDEX idx_review_tasks_open_feed ON review_tasks (reward_pool_micros DESC, created_at) INCLUDE (expires_at)
+    WHERE status = 'open' AND submission_count < required_reviews;
 CREATE INDEX idx_package_quality_package ON package_quality_scores(package_id);
@@ -0,0 +1,116 @@
+-- API-key principals: table, sync triggers and a backfill of existing keys.
+-- Idempotent; included by schema.sql and re-run by /admin/migrate.
+
+-- One row per API key (users, suppliers and reviewers), keyed by its SHA-256,
+-- kept in sync by triggers so any key resolves with a single index probe
+CREATE TABLE IF NOT EXISTS principals (
+    key_hash CHAR(64) NOT NULL,
+    principal_type VARCHAR(20) NOT NULL CHECK (principal_type IN ('user', 'supplier', 'reviewer')),
+    entity_id INTEGER NOT NULL,
+    roles TEXT[] NOT NULL DEFAULT '{}',
+    status VARCHAR(20) NOT NULL DEFAULT 'active',
+    payout_address VARCHAR(56),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Covering index: lookups are index-only scans
+CREATE UNIQUE INDEX IF NOT EXISTS idx_principals_key_hash ON principals(key_hash)
+    INCLUDE (principal_type, entity_id, roles, status, payout_address);
+
+CREATE OR REPLACE FUNCTION principal_key_hash(api_key TEXT) RETURNS CHAR(64) AS $$
+    SELECT encode(sha256(convert_to(api_key, 'UTF8')), 'hex')
+$$ LANGUAGE SQL IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION upsert_principal(
+    p_api_key TEXT, p_type TEXT, p_entity_id INTEGER, p_roles TEXT[], p_status TEXT, p_payout_address TEXT
+) RETURNS VOID AS $$
+    INSERT INTO principals (key_hash, principal_type, entity_id, roles, status, payout_address)
+    VALUES (principal_key_hash(p_api_key), p_type, p_entity_id, p_roles, p_status, p_payout_address)
+    ON CONFLICT (key_hash) DO UPDATE SET
+        principal_type = EXCLUDED.principal_type,
+        entity_id = EXCLUDED.entity_id,
+        roles = EXCLUDED.roles,
+        status = EXCLUDED.status,
+        payout_address = EXCLUDED.payout_address,
+        updated_at = NOW()
+$$ LANGUAGE SQL;
+
+CREATE OR REPLACE FUNCTION sync_supplier_principal() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' AND OLD.api_key IS NOT NULL
+       AND (TG_OP = 'DELETE' OR OLD.api_key IS DISTINCT FROM NEW.api_key) THEN
+        DELETE FROM principals WHERE key_hash = principal_key_hash(OLD.api_key);
+    END IF;
+    IF TG_OP <> 'DELETE' AND NEW.api_key IS NOT NULL THEN
+        PERFORM upsert_principal(NEW.api_key, 'supplier', NEW.id, ARRAY['buyer', 'supplier'],
+                                 NEW.status, NEW.stellar_address);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_reviewer_principal() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' AND OLD.api_key IS NOT NULL
+       AND (TG_OP = 'DELETE' OR OLD.api_key IS DISTINCT FROM NEW.api_key) THEN
+        DELETE FROM principals WHERE key_hash = principal_key_hash(OLD.api_key);
+    END IF;
+    IF TG_OP <> 'DELETE' AND NEW.api_key IS NOT NULL THEN
+        PERFORM upsert_principal(NEW.api_key, 'reviewer', NEW.id, ARRAY['buyer', 'reviewer'],
+                                 'active', NEW.stellar_address);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- User keys are shared by all of a user's roles, so the row is re-aggregated
+CREATE OR REPLACE FUNCTION sync_user_principal() RETURNS TRIGGER AS $$
+DECLARE
+    changed_key TEXT := CASE WHEN TG_OP = 'DELETE' THEN OLD.api_key ELSE NEW.api_key END;
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.api_key IS NOT NULL AND OLD.api_key IS DISTINCT FROM NEW.api_key THEN
+        DELETE FROM principals WHERE key_hash = principal_key_hash(OLD.api_key);
+    END IF;
+    IF changed_key IS NULL THEN
+        RETURN NULL;
+    END IF;
+    DELETE FROM principals WHERE key_hash = principal_key_hash(changed_key);
+    PERFORM upsert_principal(changed_key, 'user', u.id,
+                             COALESCE(ARRAY_AGG(ur.role_type::TEXT) FILTER (WHERE ur.is_active), '{}'),
+                             CASE WHEN BOOL_OR(ur.is_active) THEN 'active' ELSE 'inactive' END,
+                             u.stellar_address)
+    FROM users u
+    JOIN user_roles ur ON ur.user_id = u.id
+    WHERE ur.api_key = changed_key
+    GROUP BY u.id, u.stellar_address;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER suppliers_principal AFTER INSERT OR UPDATE OR DELETE ON suppliers
+    FOR EACH ROW EXECUTE FUNCTION sync_supplier_principal();
+CREATE OR REPLACE TRIGGER reviewers_principal AFTER INSERT OR UPDATE OR DELETE ON reviewers
+    FOR EACH ROW EXECUTE FUNCTION sync_reviewer_principal();
+CREATE OR REPLACE TRIGGER user_roles_principal AFTER INSERT OR UPDATE OR DELETE ON user_roles
+    FOR EACH ROW EXECUTE FUNCTION sync_user_principal();
+
+-- Backfill keys that existed before the triggers
+INSERT INTO principals (key_hash, principal_type, entity_id, roles, status, payout_address)
+SELECT principal_key_hash(api_key), 'supplier', id, ARRAY['buyer', 'supplier'], status, stellar_address
+FROM suppliers WHERE api_key IS NOT NULL
+ON CONFLICT (key_hash) DO NOTHING;
+
+INSERT INTO principals (key_hash, principal_type, entity_id, roles, status, payout_address)
+SELECT principal_key_hash(api_key), 'reviewer', id, ARRAY['buyer', 'reviewer'], 'active', stellar_address
+FROM reviewers WHERE api_key IS NOT NULL
+ON CONFLICT (key_hash) DO NOTHING;
+
+INSERT INTO principals (key_hash, principal_type, entity_id, roles, status, payout_address)
+SELECT principal_key_hash(ur.api_key), 'user', u.id,
+       COALESCE(ARRAY_AGG(ur.role_type::TEXT) FILTER (WHERE ur.is_active), '{}'),
+       CASE WHEN BOOL_OR(ur.is_active) THEN 'active' ELSE 'inactive' END,
+       u.stellar_address
+FROM users u JOIN user_roles ur ON ur.user_id = u.id
+WHERE ur.api_key IS NOT NULL
+GROUP BY ur.api_key, u.id, u.stellar_address
+ON CONFLICT (key_hash) DO NOTHING;